@@ -1,18 +1,26 @@
 """API兼容层 - FastAPI应用"""
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse, StreamingResponse
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional, Union
-import json
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+import orjson
 import asyncio
 import os
 from config import Config
 from client import ModelManager
 
+# 安装uvloop事件循环策略：即使不经过__main__入口（如直接 uvicorn api:app 启动）
+# 也能用上libuv实现的事件循环。Windows等不支持的平台回退到默认策略
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
 # 获取logger
 logger = logging.getLogger(__name__)
 
@@ -29,7 +37,7 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时的初始化
     logger.info("AI聚合代理服务启动中...")
-    logger.info(f"已加载 {len(config.providers)} 个供应商配置")
+    logger.info("已加载 %s 个供应商配置", len(config.providers))
     
     yield
     
@@ -37,16 +45,16 @@ async def lifespan(app: FastAPI):
     logger.info("正在关闭AI聚合代理服务...")
     await model_manager.close_all()
 
-# 创建安全方案
-security = HTTPBearer(auto_error=False)
+def get_bearer_token(request: Request) -> Optional[str]:
+    """从Authorization头解析Bearer token
 
-def get_current_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
-    """获取当前token"""
-    if credentials is None:
-        logger.debug("未提供token")
-        return None
-    logger.debug(f"收到token: {credentials.credentials}")
-    return credentials.credentials
+    直接读取请求头，绕过HTTPBearer安全方案和依赖注入链的每请求开销。
+    """
+    auth = request.headers.get("authorization", "")
+    if auth.startswith("Bearer "):
+        return auth[7:]
+    logger.debug("未提供token")
+    return None
 
 
 # 响应模型
@@ -69,9 +77,32 @@ app = FastAPI(
     title="AI聚合代理",
     description="兼容OpenAI API的AI模型聚合代理服务",
     version="1.0.0",
-    lifespan=lifespan  # 使用现代化的生命周期管理
+    lifespan=lifespan,  # 使用现代化的生命周期管理
+    default_response_class=ORJSONResponse  # 使用orjson序列化响应，避免标准json的性能开销
 )
 
+# 压缩大响应（模型列表、非流式聊天补全的JSON可达数十至数百KB）。
+# text/event-stream在中间件的默认排除列表中，流式响应不会被压缩攒批
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """拒绝超大请求体，在读入内存之前直接返回413"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > config.max_request_size:
+        return ORJSONResponse(
+            status_code=413,
+            content={
+                "error": {
+                    "message": f"请求体过大，超过限制 ({config.max_request_size} bytes)",
+                    "type": "request_too_large",
+                    "code": 413
+                }
+            }
+        )
+    return await call_next(request)
+
 
 
 
@@ -83,7 +114,7 @@ async def health_check():
     healthy_providers = sum(1 for status in health_status.values() if status)
     total_providers = len(health_status)
     
-    logger.info(f"健康检查结果: {healthy_providers}/{total_providers} 个供应商健康")
+    logger.info("健康检查结果: %d/%d 个供应商健康", healthy_providers, total_providers)
     return {
         "status": "healthy" if healthy_providers > 0 else "unhealthy",
         "providers": health_status,
@@ -92,26 +123,26 @@ async def health_check():
     }
 
 
-@app.get("/v1/models", response_model=ModelsResponse)
+@app.get("/v1/models", responses={200: {"model": ModelsResponse}})
 async def list_models():
     """获取所有可用模型列表"""
     try:
         logger.info("收到获取模型列表请求")
         models_data = await model_manager.get_all_models()
-        models = [ModelInfo(**model) for model in models_data]
-        logger.info(f"返回 {len(models)} 个模型")
-        return ModelsResponse(data=models)
+        logger.info("返回 %d 个模型", len(models_data))
+        # 模型数据已经是可序列化的字典，直接返回，避免重复构造Pydantic对象再序列化
+        return ORJSONResponse({"object": "list", "data": models_data})
     except Exception as e:
-        logger.error(f"获取模型列表失败: {str(e)}")
+        logger.error("获取模型列表失败: %s", str(e))
         raise HTTPException(status_code=500, detail=f"获取模型列表失败: {str(e)}")
 
 
 @app.post("/v1/chat/completions")
-async def create_chat_completion(request: Request,
-                                 token: Optional[str] = Depends(get_current_token)):
+async def create_chat_completion(request: Request):
     """创建聊天完成 - 接受任意参数并转发给上游"""
     try:
         # 1. 先验证 token（不解析 body，避免无效请求浪费资源）
+        token = get_bearer_token(request)
         if not token:
             logger.warning("未提供API token")
             raise HTTPException(
@@ -119,35 +150,47 @@ async def create_chat_completion(request: Request,
                 detail="未提供API token"
             )
         
-        if not config.validate_token(token):
-            logger.warning(f"无效的API token: {token}")
+        # 单次哈希查找完成验证和描述获取
+        token_info = config.get_token_info(token)
+        if token_info is None:
+            # 只记录前缀，避免把完整token明文写进日志
+            logger.warning("无效的API token: %s...", token[:8])
             raise HTTPException(
                 status_code=401,
                 detail="无效的API token"
             )
+
+        logger.info("token验证通过，使用token: %s", token_info)
         
-        token_info = config.get_token_info(token)
-        logger.info(f"token验证通过，使用token: {token_info}")
-        
-        # 2. 解析请求体
-        body = await request.json()
-        
-        # 验证必需参数
-        if not body.get("model"):
+        # 2. 解析请求体（orjson直接解析原始字节，跳过Pydantic逐字段校验）
+        try:
+            body = orjson.loads(await request.body())
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="请求体不是有效的JSON")
+
+        if not isinstance(body, dict):
+            raise HTTPException(status_code=400, detail="请求体必须是JSON对象")
+
+        # 验证必需参数（轻量级手动检查，代替完整的模型校验）
+        if not isinstance(body.get("model"), str) or not body["model"]:
             raise HTTPException(status_code=400, detail="缺少必需参数: model")
+
+        if not isinstance(body.get("messages"), list):
+            raise HTTPException(status_code=400, detail="缺少必需参数: messages")
         
         # 提取stream参数（用于判断响应类型）
         is_stream = body.get("stream", False)
         
-        # 记录请求参数
-        logger.debug(f"请求参数: {json.dumps(body, ensure_ascii=False)}")
+        # 记录请求参数（序列化开销大，DEBUG关闭时直接跳过）
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("请求参数: %s", orjson.dumps(body).decode())
         
         # 3. 直接把原始 body 传给模型管理器
         result = await model_manager.chat_completion(body)
         
         # 检查是否有错误
         if "error" in result:
-            logger.error(f"聊天完成请求返回错误: {result['error']['message']}")
+            logger.error("聊天完成请求返回错误: %s", result['error']['message'])
             raise HTTPException(
                 status_code=500,
                 detail=result["error"]["message"]
@@ -156,21 +199,52 @@ async def create_chat_completion(request: Request,
         # 处理流式响应
         if is_stream and "stream_response" in result:
             logger.info("返回流式响应")
-            
+
+            # 有界队列形成背压：客户端消费慢于上游产出时put会阻塞，
+            # 内存占用上限为 maxsize × 数据块大小，不随客户端速度无限增长
+            queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+
+            async def pump_upstream():
+                """上游读取任务：把数据块灌入有界队列，结尾放入None或异常"""
+                try:
+                    async for chunk in result["stream_response"]:
+                        await queue.put(chunk)
+                    await queue.put(None)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await queue.put(e)
+                finally:
+                    # 读取结束、出错或被取消时统一关闭上游连接
+                    close = result.get("stream_close")
+                    if close is not None:
+                        try:
+                            await close()
+                            logger.debug("上游流式响应连接已关闭")
+                        except Exception as e:
+                            logger.error("关闭上游流式连接失败: %s", e)
+
+            pump_task = asyncio.create_task(pump_upstream())
+
             async def stream_wrapper():
                 """包装流式响应，确保正确传递SSE格式的数据"""
                 chunk_count = 0
                 try:
-                    async for chunk in result["stream_response"]:
+                    while True:
+                        chunk = await queue.get()
+                        if chunk is None:
+                            break
+                        if isinstance(chunk, Exception):
+                            raise chunk
                         chunk_count += 1
-                        # 直接传递从供应商返回的SSE格式数据
+                        # 直接透传供应商返回的SSE字节数据，无需重新编码
                         yield chunk
-                    logger.debug(f"流式响应完成，共发送 {chunk_count} 个数据块")
+                    logger.debug("流式响应完成，共发送 %d 个数据块", chunk_count)
                 except asyncio.CancelledError:
-                    logger.warning(f"客户端取消了流式请求，已发送 {chunk_count} 个数据块")
+                    logger.warning("客户端取消了流式请求，已发送 %d 个数据块", chunk_count)
                     raise
                 except Exception as e:
-                    logger.error(f"流式响应处理错误: {str(e)}，已发送 {chunk_count} 个数据块")
+                    logger.error("流式响应处理错误: %s，已发送 %d 个数据块", str(e), chunk_count)
                     # 发送错误事件
                     error_data = {
                         "error": {
@@ -179,7 +253,11 @@ async def create_chat_completion(request: Request,
                             "code": "stream_error"
                         }
                     }
-                    yield f"data: {json.dumps(error_data)}\n\n"
+                    yield b"data: " + orjson.dumps(error_data) + b"\n\n"
+                finally:
+                    # 客户端断开或响应结束时停止上游读取；
+                    # pump_upstream的finally块负责关闭上游连接
+                    pump_task.cancel()
             
             return StreamingResponse(
                 stream_wrapper(),
@@ -193,43 +271,55 @@ async def create_chat_completion(request: Request,
             )
         
         logger.info("聊天完成请求成功")
-        return JSONResponse(content=result)
+        return ORJSONResponse(result)
         
     except HTTPException as e:
-        logger.warning(f"HTTP异常: {e.status_code} - {e.detail}")
+        logger.warning("HTTP异常: %s - %s", e.status_code, e.detail)
         raise
     except Exception as e:
-        logger.error(f"聊天完成请求失败: {str(e)}")
+        logger.error("聊天完成请求失败: %s", str(e))
         raise HTTPException(
             status_code=500, 
             detail=f"聊天完成请求失败: {str(e)}"
         )
 
 
+# 旧模型管理器的延迟关闭时间（秒），给在途请求留出收尾时间
+RELOAD_CLOSE_GRACE = 30.0
+
+
+async def _delayed_close(manager: ModelManager, delay: float):
+    """延迟关闭被替换的模型管理器"""
+    try:
+        await asyncio.sleep(delay)
+        await manager.close_all()
+        logger.info("旧模型管理器已关闭")
+    except Exception as e:
+        logger.error("关闭旧模型管理器失败: %s", e)
+
+
 @app.post("/v1/reload")
 async def reload_config():
     """重新加载配置"""
     global model_manager
     try:
         logger.info("收到重新加载配置请求")
-        
-        # 关闭现有客户端
-        await model_manager.close_all()
-        
-        # 重新加载配置
+
+        # 先构建并预热新管理器，再原子替换引用，最后延迟关闭旧管理器。
+        # 在途请求持有的旧客户端在宽限期内仍然可用，不会出现关闭竞态
         config.reload()
-        
-        # 重新创建模型管理器
-        model_manager = ModelManager(config.providers, config)
-        
-        # 清除模型缓存
-        model_manager.clear_cache()
-        
-        logger.info(f"配置重新加载成功，当前供应商数量: {len(config.providers)}")
+        new_manager = ModelManager(config.providers, config)
+        await new_manager.get_all_models()  # 预热模型缓存
+
+        old_manager = model_manager
+        model_manager = new_manager
+        asyncio.create_task(_delayed_close(old_manager, RELOAD_CLOSE_GRACE))
+
+        logger.info("配置重新加载成功，当前供应商数量: %d", len(config.providers))
         return {"message": "配置重新加载成功", "providers_count": len(config.providers)}
         
     except Exception as e:
-        logger.error(f"重新加载配置失败: {str(e)}")
+        logger.error("重新加载配置失败: %s", str(e))
         raise HTTPException(
             status_code=500, 
             detail=f"重新加载配置失败: {str(e)}"
@@ -257,7 +347,7 @@ async def root():
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """HTTP异常处理"""
-    logger.warning(f"HTTP异常处理: {exc.status_code} - {exc.detail}")
+    logger.warning("HTTP异常处理: %s - %s", exc.status_code, exc.detail)
     return JSONResponse(
         status_code=exc.status_code,
         content={
@@ -273,7 +363,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     """通用异常处理"""
-    logger.error(f"通用异常处理: {str(exc)}")
+    logger.error("通用异常处理: %s", str(exc))
     return JSONResponse(
         status_code=500,
         content={
@@ -292,22 +382,18 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     详细的验证错误处理器
     """
     # 记录详细的错误信息
-    logger.error(f"请求验证错误: {exc.errors()}")
+    logger.error("请求验证错误: %s", exc.errors())
     
-    # 尝试获取原始请求体
+    # 尝试获取原始请求体（只记录前4KB摘要，恶意超大载荷不再触发全量解析和格式化）
     try:
         body = await request.body()
-        body_str = body.decode()
-        logger.error(f"接收到的原始请求体: {body_str}")
-        
-        # 尝试解析JSON以便更好地格式化
-        try:
-            body_json = json.loads(body_str)
-            logger.error(f"解析后的JSON: {json.dumps(body_json, indent=2, ensure_ascii=False)}")
-        except json.JSONDecodeError:
-            logger.error("请求体不是有效的JSON格式")
+        snippet = body[:4096].decode('utf-8', 'replace')
+        if len(body) > 4096:
+            logger.error("接收到的原始请求体(前4KB，共%d字节): %s", len(body), snippet)
+        else:
+            logger.error("接收到的原始请求体: %s", snippet)
     except Exception as e:
-        logger.error(f"读取请求体失败: {e}")
+        logger.error("读取请求体失败: %s", e)
 
     # 返回更友好的错误信息
     return JSONResponse(
@@ -325,11 +411,19 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 if __name__ == "__main__":
     import uvicorn
-    
+
+    # 工作进程数：0表示自动（I/O密集型服务，取2*核心数+1）
+    workers = config.workers or (os.cpu_count() or 1) * 2 + 1
+
+    # 注意：workers>1时必须传入导入字符串，每个工作进程重新导入模块，
+    # 各自持有独立的ModelManager和httpx连接池
     uvicorn.run(
-        app,
+        "api:app",
         host=config.host,
         port=config.port,
-        log_level="info",
-        access_log=False
+        log_level="warning",  # uvicorn自身的日志降到warning，省去每请求的格式化开销
+        access_log=False,
+        loop="uvloop",       # libuv事件循环，降低每次系统调用开销
+        http="httptools",    # C实现的HTTP解析器
+        workers=workers
     )
@@ -1,8 +1,11 @@
 """供应商客户端模块"""
 import asyncio
+import functools
+import hashlib
 import httpx
-import json
+import itertools
 import logging
+import orjson
 import time
 from typing import List, Dict, Any, Optional
 from config import Provider
@@ -10,24 +13,40 @@ from config import Provider
 # 获取logger
 logger = logging.getLogger(__name__)
 
+# 跨热重载共享的httpx客户端池：key为(base_url, api_key哈希)，value为[客户端, 引用计数]。
+# 配置未变化的供应商在/v1/reload后复用原有客户端，保留已建立的TLS/HTTP2连接
+_client_pool: Dict[tuple, list] = {}
+
+
+def _pool_key(base_url: str, api_key: str) -> tuple:
+    """计算客户端池的key（api_key取哈希，避免池中长期持有明文密钥）"""
+    digest = hashlib.blake2b(api_key.encode(), digest_size=16).hexdigest()
+    return (base_url, digest)
+
+
+@functools.lru_cache(maxsize=2048)
+def parse_model_name(model: str) -> tuple:
+    """解析模型名称，返回(供应商名称, 实际模型名)
+
+    每个请求都会调用；客户端通常反复使用同一模型名，
+    lru_cache让重复解析退化为一次哈希查找。
+
+    Args:
+        model: 模型名称，格式为 "供应商/模型" 或 "模型"
+
+    Returns:
+        (供应商名称, 实际模型名) 元组
+    """
+    # partition只扫描一次且不分配列表，比 "/" in model + split 更快
+    head, sep, tail = model.partition("/")
+    return (head, tail) if sep else ("", model)
+
 
 class ProviderClient:
     """供应商客户端"""
-    
-    @staticmethod
-    def parse_model_name(model: str) -> tuple:
-        """解析模型名称，返回(供应商名称, 实际模型名)
-        
-        Args:
-            model: 模型名称，格式为 "供应商/模型" 或 "模型"
-            
-        Returns:
-            (供应商名称, 实际模型名) 元组
-        """
-        if "/" in model:
-            parts = model.split("/", 1)
-            return parts[0], parts[1]
-        return "", model
+
+    # 兼容旧调用方式的别名，实际实现见模块级parse_model_name
+    parse_model_name = staticmethod(parse_model_name)
     
     def _create_error_response(self, message: str, error_type: str = "provider_error") -> dict:
         """创建统一的错误响应
@@ -50,16 +69,22 @@ class ProviderClient:
     def __init__(self, provider: Provider, config=None):
         self.provider = provider
         self.config = config
-        self.health_check_retry = 3
         self._models_cache: Optional[List[Dict[str, Any]]] = None  # 模型缓存
+        self._cache_ttl: float = 300.0  # 缓存过期后触发后台刷新（秒）
+        self._last_fetch_time: float = 0.0  # 上次成功拉取时间
+        self._refresh_task: Optional[asyncio.Task] = None  # 后台刷新任务
+        self._static_models = bool(provider.model_list)  # 手动配置的列表不过期
+        self._health_result: bool = False  # 上次健康检查结果
+        self._health_checked_at: Optional[float] = None  # 上次检查时间（monotonic）
 
         if provider.model_list:
+            # model_list是无序集合，排序后输出保证/v1/models列表顺序稳定
             self._models_cache = [{
                 "id": f"{self.provider.name}/{p}",
                 "object": "model",
                 "created": 1748488196000,
                 "owned_by": self.provider.name
-            } for p in provider.model_list]
+            } for p in sorted(provider.model_list)]
         
         # 检查URL是否已经包含完整的API路径
         if provider.url.endswith('/chat/completions'):
@@ -72,49 +97,97 @@ class ProviderClient:
             self.chat_endpoint = "/chat/completions"
         
         # 从配置获取超时和连接池参数
-        stream_timeout = config.stream_timeout if config else 300.0
-        non_stream_timeout = config.non_stream_timeout if config else 30.0
-        max_connections = config.max_connections if config else 100
-        max_keepalive = config.max_keepalive_connections if config else 20
-        keepalive_expiry = config.keepalive_expiry if config else 30.0
-        
-        # 为流式请求使用更长的超时时间
-        self.client = httpx.AsyncClient(
-            base_url=base_url,
-            headers={
-                "Authorization": f"Bearer {provider.api_key}",
-                "Content-Type": "application/json"
-            },
-            timeout=httpx.Timeout(
-                connect=10.0,  # 连接超时
-                read=stream_timeout,  # 读取超时（从配置读取）
-                write=10.0,    # 写入超时
-                pool=10.0      # 连接池超时
-            ),
-            limits=httpx.Limits(
-                max_keepalive_connections=max_keepalive,  # 从配置读取
-                max_connections=max_connections,           # 从配置读取
-                keepalive_expiry=keepalive_expiry          # 从配置读取
-            )
-        )
-        logger.info(f"初始化供应商客户端: {provider.name}, base_url: {base_url}, "
-                   f"chat_endpoint: {self.chat_endpoint}, "
-                   f"stream_timeout: {stream_timeout}s, non_stream_timeout: {non_stream_timeout}s")
+        self._stream_timeout = config.stream_timeout if config else 300.0
+        self._non_stream_timeout = config.non_stream_timeout if config else 30.0
+        self._max_connections = config.max_connections if config else 100
+        self._max_keepalive = config.max_keepalive_connections if config else 20
+        self._keepalive_expiry = config.keepalive_expiry if config else 30.0
+
+        # httpx客户端延迟到首次使用时构建（见client属性）
+        self._base_url = base_url
+        self._pool_key = _pool_key(base_url, provider.api_key)
+        self._client: Optional[httpx.AsyncClient] = None
+
+        logger.info("初始化供应商客户端: %s, base_url: %s, chat_endpoint: %s, "
+                    "stream_timeout: %ss, non_stream_timeout: %ss",
+                    provider.name, base_url, self.chat_endpoint,
+                    self._stream_timeout, self._non_stream_timeout)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """延迟构建的httpx客户端
+
+        实例可能在worker进程fork/spawn之前创建（uvicorn多worker会在
+        导入时构建ModelManager），推迟到第一个请求时再建客户端，
+        确保连接池绑定到worker自己的事件循环。优先复用池中客户端。
+        """
+        if self._client is None:
+            entry = _client_pool.get(self._pool_key)
+            if entry is not None:
+                entry[1] += 1
+                self._client = entry[0]
+            else:
+                # 为流式请求使用更长的超时时间
+                self._client = httpx.AsyncClient(
+                    base_url=self._base_url,
+                    http2=True,  # HTTP/2多路复用：并发请求共享一条TLS连接，减少握手开销
+                    headers={
+                        "Authorization": f"Bearer {self.provider.api_key}",
+                        "Content-Type": "application/json"
+                    },
+                    timeout=httpx.Timeout(
+                        connect=10.0,  # 连接超时
+                        read=self._stream_timeout,  # 读取超时（从配置读取）
+                        write=10.0,    # 写入超时
+                        pool=10.0      # 连接池超时
+                    ),
+                    limits=httpx.Limits(
+                        max_keepalive_connections=self._max_keepalive,  # 从配置读取
+                        max_connections=self._max_connections,           # 从配置读取
+                        keepalive_expiry=self._keepalive_expiry          # 从配置读取
+                    )
+                )
+                _client_pool[self._pool_key] = [self._client, 1]
+        return self._client
     
     async def get_models(self) -> List[Dict[str, Any]]:
-        """获取供应商支持的模型列表
-        
-        Args:
-            force_refresh: 是否强制刷新，默认False
-            
+        """获取供应商支持的模型列表（stale-while-revalidate）
+
+        缓存过期后依旧立即返回旧数据，同时调度一次后台刷新；
+        只有冷启动（没有任何缓存）时才阻塞等待上游。
+
         Returns:
             模型列表
         """
+        # 手动配置的模型列表不会变化，直接返回
+        if self._static_models:
+            return self._models_cache
+
+        if self._models_cache is not None:
+            if time.monotonic() - self._last_fetch_time >= self._cache_ttl:
+                # 过期：返回旧数据并触发后台刷新，同一时刻最多一个刷新任务
+                if self._refresh_task is None or self._refresh_task.done():
+                    self._refresh_task = asyncio.create_task(self._refresh_models())
+            return self._models_cache
 
-        if self._models_cache is None:
-            self._models_cache = await self._fetch_models_with_retry()
+        # 冷启动：同步拉取
+        models = await self._fetch_models_with_retry()
+        if models is not None:
+            self._models_cache = models
+            self._last_fetch_time = time.monotonic()
 
         return self._models_cache if self._models_cache is not None else []
+
+    async def _refresh_models(self):
+        """后台刷新模型缓存
+
+        成功时整体替换缓存（替换而不是先清空，读方任何时刻都有数据可用）；
+        失败时保留旧数据，等待下次过期重试。
+        """
+        models = await self._fetch_models_with_retry()
+        if models is not None:
+            self._models_cache = models
+            self._last_fetch_time = time.monotonic()
     
     async def _fetch_models_with_retry(self, max_retries: int = 3) -> Optional[List[Dict[str, Any]]]:
         """从供应商获取模型列表（带重试）
@@ -131,44 +204,42 @@ class ProviderClient:
                 if attempt > 0:
                     # 重试前等待，使用指数退避
                     wait_time = min(2 ** attempt, 10)
-                    logger.info(f"供应商 {self.provider.name} 第 {attempt + 1}/{max_retries} 次重试，等待 {wait_time} 秒...")
+                    logger.info("供应商 %s 第 %s/%s 次重试，等待 %s 秒...", self.provider.name, attempt + 1, max_retries, wait_time)
                     await asyncio.sleep(wait_time)
                 
-                logger.info(f"开始获取供应商 {self.provider.name} 的模型列表 (尝试 {attempt + 1}/{max_retries})")
+                logger.info("开始获取供应商 %s 的模型列表 (尝试 %s/%s)", self.provider.name, attempt + 1, max_retries)
                 
                 # 使用较短的超时时间获取模型列表
                 response = await self.client.get("/models", timeout=15.0)
                 response.raise_for_status()
-                data = response.json()
+                data = orjson.loads(response.content)
                 
-                # 标准化模型数据格式
-                models = []
-                if "data" in data:
-                    for model in data["data"]:
-                        # 添加供应商前缀到模型ID
-                        model_id = f"{self.provider.name}/{model.get('id', model.get('model', ''))}"
-                        models.append({
-                            "id": model_id,
-                            "object": model.get("object", "model"),
-                            "created": model.get("created"),
-                            "owned_by": self.provider.name
-                        })
+                # 标准化模型数据格式：供应商前缀和owned_by在循环外求值一次，
+                # 列表推导式走LIST_APPEND快路径并预分配容量
+                prefix = self.provider.name + "/"
+                owner = self.provider.name
+                models = [{
+                    "id": prefix + (m.get("id") or m.get("model") or ""),
+                    "object": m.get("object", "model"),
+                    "created": m.get("created"),
+                    "owned_by": owner
+                } for m in data.get("data", ())]
                 
-                logger.info(f"成功获取供应商 {self.provider.name} 的 {len(models)} 个模型")
+                logger.info("成功获取供应商 %s 的 %s 个模型", self.provider.name, len(models))
                 return models
                 
             except httpx.TimeoutException as e:
-                logger.warning(f"获取供应商 {self.provider.name} 模型超时 (尝试 {attempt + 1}/{max_retries}): {e}")
+                logger.warning("获取供应商 %s 模型超时 (尝试 %s/%s): %s", self.provider.name, attempt + 1, max_retries, e)
                 if attempt == max_retries - 1:
-                    logger.error(f"获取供应商 {self.provider.name} 模型失败：超过最大重试次数")
+                    logger.error("获取供应商 %s 模型失败：超过最大重试次数", self.provider.name)
             except httpx.NetworkError as e:
-                logger.warning(f"获取供应商 {self.provider.name} 模型网络错误 (尝试 {attempt + 1}/{max_retries}): {e}")
+                logger.warning("获取供应商 %s 模型网络错误 (尝试 %s/%s): %s", self.provider.name, attempt + 1, max_retries, e)
                 if attempt == max_retries - 1:
-                    logger.error(f"获取供应商 {self.provider.name} 模型失败：网络错误")
+                    logger.error("获取供应商 %s 模型失败：网络错误", self.provider.name)
             except Exception as e:
-                logger.warning(f"获取供应商 {self.provider.name} 模型失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+                logger.warning("获取供应商 %s 模型失败 (尝试 %s/%s): %s", self.provider.name, attempt + 1, max_retries, e)
                 if attempt == max_retries - 1:
-                    logger.error(f"获取供应商 {self.provider.name} 模型失败：{e}")
+                    logger.error("获取供应商 %s 模型失败：%s", self.provider.name, e)
             finally:
                 # 确保响应被关闭
                 if response:
@@ -202,26 +273,30 @@ class ProviderClient:
             # 解析模型名称，提取实际的模型ID
             _, actual_model = self.parse_model_name(model)
             
-            logger.info(f"向供应商 {self.provider.name} 发送聊天请求，模型: {actual_model}, 消息数: {len(messages)}")
+            logger.info("向供应商 %s 发送聊天请求，模型: %s, 消息数: %s", self.provider.name, actual_model, len(messages))
             
             # 构造要发送给上游的请求体：原样保留所有参数，仅替换 model 字段
             data = dict(body)
             data["model"] = actual_model
             
-            logger.debug(f"请求数据: {json.dumps(data, ensure_ascii=False)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("请求数据: %s", orjson.dumps(data).decode())
             
             # 检查是否为流式请求
             is_stream = body.get('stream', False)
             
-            # 根据是否流式选择不同的请求方式
-            if is_stream:
-                # 流式请求：使用stream=True
-                request = self.client.build_request('POST', self.chat_endpoint, json=data)
-                response = await self.client.send(request, stream=True)
-            else:
-                # 非流式请求：直接发送，不使用stream模式
-                response = await self.client.post(self.chat_endpoint, json=data)
-            
+            # 统一以stream模式发出：流式分支边到达边转发；
+            # 非流式分支增量读取，超过大小限制时立即中止而不是下载完再检查
+            # content=直接传入orjson预编码的字节，跳过httpx内部的stdlib json.dumps；
+            # Content-Type等请求头复用客户端级配置，不再按请求重建
+            request = self.client.build_request('POST', self.chat_endpoint,
+                                                content=orjson.dumps(data))
+            response = await self.client.send(request, stream=True)
+            # 流式模式下响应体尚未读取，错误状态需要先读出body再抛出，
+            # 否则异常处理中访问e.response.text会失败
+            if response.status_code >= 400:
+                await response.aread()
+
             response.raise_for_status()
             
             # 检查响应类型，处理流式和非流式响应
@@ -229,33 +304,15 @@ class ProviderClient:
             
             if 'text/event-stream' in content_type or is_stream:
                 # 处理流式响应 (Server-Sent Events)
-                logger.info(f"供应商 {self.provider.name} 返回流式响应")
+                logger.info("供应商 %s 返回流式响应", self.provider.name)
                 is_stream_response = True  # 标记为流式响应
-                
-                # 创建真正的流式生成器
-                async def stream_generator():
-                    """流式生成器，确保资源正确释放"""
-                    try:
-                        async for chunk in response.aiter_text():
-                            yield chunk
-                    except asyncio.CancelledError:
-                        logger.warning(f"供应商 {self.provider.name} 流式请求被取消")
-                        raise
-                    except Exception as e:
-                        logger.error(f"供应商 {self.provider.name} 流式响应错误: {str(e)}")
-                        raise
-                    finally:
-                        # 确保响应被正确关闭
-                        try:
-                            await response.aclose()
-                            logger.debug(f"供应商 {self.provider.name} 流式响应连接已关闭")
-                        except Exception as e:
-                            logger.error(f"关闭流式响应连接时出错: {str(e)}")
-                
-                # 返回流式生成器供API层处理
-                # 注意：连接关闭由stream_generator的finally块管理
+
+                # 直接暴露原始字节迭代器：上游SSE数据由API层原样透传，
+                # 省去一层async生成器包装（每个数据块少一次帧切换）。
+                # 连接关闭由API层在转发结束/出错/客户端断开时调用stream_close完成
                 result = {
-                    "stream_response": stream_generator()
+                    "stream_response": response.aiter_bytes(),
+                    "stream_close": response.aclose
                 }
             else:
                 # 处理非流式响应
@@ -263,24 +320,24 @@ class ProviderClient:
                     # 从配置获取响应大小限制
                     max_size = self.config.max_response_size if self.config else (10 * 1024 * 1024)
                     
-                    # 检查响应大小
+                    # Content-Length头可用时提前拒绝，连一个字节都不用读
                     content_length = response.headers.get('content-length')
                     if content_length and int(content_length) > max_size:
                         raise ValueError(f"响应大小 ({content_length} bytes) 超过限制 ({max_size} bytes)")
-                    
-                    # 读取响应内容
-                    if is_stream:
-                        # 如果使用了stream模式，需要用aread
-                        content = await response.aread()
-                    else:
-                        # 否则直接获取内容
-                        content = response.content
-                    
-                    # 检查实际读取的大小
-                    if len(content) > max_size:
-                        raise ValueError(f"实际响应大小 ({len(content)} bytes) 超过限制 ({max_size} bytes)")
-                    
-                    result = json.loads(content)
+
+                    # 增量读取并累计字节数：上游未提供Content-Length或声明不实时，
+                    # 一旦超限立即中止，内存峰值不会超过限制值
+                    buf = bytearray()
+                    async for chunk in response.aiter_bytes(65536):
+                        buf.extend(chunk)
+                        if len(buf) > max_size:
+                            raise ValueError(f"实际响应大小 (超过{len(buf)} bytes) 超过限制 ({max_size} bytes)")
+
+                    # bytearray可直接交给orjson解析，省去一次bytes拷贝；
+                    # 长度只计算一次，增量读取已经保证不会超限
+                    content = buf
+                    content_len = len(buf)
+                    result = orjson.loads(content)
                     
                     # 在响应中返回完整的模型名称
                     if "model" in result:
@@ -288,52 +345,74 @@ class ProviderClient:
                     
                     # 记录响应时间
                     elapsed_time = time.time() - start_time
-                    logger.info(f"供应商 {self.provider.name} 非流式响应成功，耗时: {elapsed_time:.2f}秒，响应大小: {len(content)} bytes")
+                    logger.info("供应商 %s 非流式响应成功，耗时: %.2f秒，响应大小: %s bytes", self.provider.name, elapsed_time, content_len)
                     
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON解析失败: {str(e)}, 内容: {content[:200] if content else 'empty'}")
+                except orjson.JSONDecodeError as e:
+                    logger.error("JSON解析失败: %s, 内容: %s", str(e), content[:200] if content else 'empty')
                     raise
                 except ValueError as e:
-                    logger.error(f"响应大小验证失败: {str(e)}")
+                    logger.error("响应大小验证失败: %s", str(e))
                     raise
             
             return result
             
         except httpx.HTTPStatusError as e:
-            logger.error(f"供应商 {self.provider.name} HTTP错误: {e.response.status_code} - {e.response.text}")
+            logger.error("供应商 %s HTTP错误: %s - %s", self.provider.name, e.response.status_code, e.response.text)
             return self._create_error_response(f"请求失败: HTTP {e.response.status_code}")
         except Exception as e:
-            logger.error(f"供应商 {self.provider.name} 请求异常: {str(e)}")
+            logger.error("供应商 %s 请求异常: %s", self.provider.name, str(e))
             return self._create_error_response(f"请求失败: {str(e)}")
         finally:
             # 只有非流式响应才在这里关闭连接
-            # 流式响应的连接由stream_generator的finally块管理
+            # 流式响应的连接由API层通过stream_close回调关闭
             if response and not is_stream_response:
                 try:
                     await response.aclose()
-                    logger.debug(f"供应商 {self.provider.name} 非流式响应连接已关闭")
+                    logger.debug("供应商 %s 非流式响应连接已关闭", self.provider.name)
                 except Exception as e:
-                    logger.error(f"关闭非流式响应连接失败: {str(e)}")
+                    logger.error("关闭非流式响应连接失败: %s", str(e))
     
     async def health_check(self) -> bool:
-        """健康检查"""
+        """健康检查（轻量HEAD探测 + 短期结果缓存）
+
+        用HEAD代替完整的GET /models：不传输也不解析模型列表响应体，
+        只确认供应商可达。结果缓存5秒，抵御负载均衡探针的突发/health请求。
+        """
+        now = time.monotonic()
+        if self._health_checked_at is not None and now - self._health_checked_at < 5.0:
+            return self._health_result
+
         try:
-            logger.debug(f"检查供应商 {self.provider.name} 健康状态")
-            # response = await self.client.get("/models")
-            # is_healthy = response.status_code == 200
-            if self.health_check_retry > 0:
-                await self.get_models()
-                self.health_check_retry -= 1
-            is_healthy = self._models_cache is not None and len(self._models_cache) > 0
-            logger.debug(f"供应商 {self.provider.name} 健康状态: {'健康' if is_healthy else '异常'}")
-            return is_healthy
+            logger.debug("检查供应商 %s 健康状态", self.provider.name)
+            response = await self.client.head("/models", timeout=2.0)
+            # 4xx（405不支持HEAD、401需鉴权等）同样说明服务可达，只有5xx视为异常
+            is_healthy = response.status_code < 500
+            logger.debug("供应商 %s 健康状态: %s", self.provider.name, '健康' if is_healthy else '异常')
         except Exception as e:
-            logger.warning(f"供应商 {self.provider.name} 健康检查失败: {e}")
-            return False
+            logger.warning("供应商 %s 健康检查失败: %s", self.provider.name, e)
+            is_healthy = False
+
+        self._health_result = is_healthy
+        self._health_checked_at = now
+        return is_healthy
     
     async def close(self):
-        """关闭客户端连接"""
-        logger.info(f"关闭供应商 {self.provider.name} 客户端连接")
+        """释放客户端引用，引用计数归零时才真正关闭连接
+
+        热重载期间新旧ModelManager共享池中客户端，
+        只有当供应商从配置中消失时连接才会被关闭。
+        """
+        if self._client is None:
+            # 从未使用过客户端，没有需要释放的引用
+            return
+        entry = _client_pool.get(self._pool_key)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] > 0:
+                logger.debug("供应商 %s 客户端仍被引用，跳过关闭", self.provider.name)
+                return
+            del _client_pool[self._pool_key]
+        logger.info("关闭供应商 %s 客户端连接", self.provider.name)
         await self.client.aclose()
 
 
@@ -344,63 +423,106 @@ class ModelManager:
         self.providers = providers
         self.clients = {p.name: ProviderClient(p, config) for p in providers}
         self.config = config
-        logger.info(f"初始化模型管理器，供应商数量: {len(providers)}")
-    
+        # 聚合模型列表缓存：TTL过期 + singleflight防止并发扇出
+        self._models_cache: Optional[List[Dict[str, Any]]] = None
+        self._models_deadline: float = 0.0  # 缓存失效时间点（monotonic时钟）
+        self._models_lock = asyncio.Lock()
+        self._models_ttl = config.models_cache_ttl if config else 60.0
+        # 模型ID -> 客户端 直接路由表，随模型列表刷新重建
+        self._model_to_client: Dict[str, ProviderClient] = {}
+        logger.info("初始化模型管理器，供应商数量: %s", len(providers))
+
     async def get_all_models(self) -> List[Dict[str, Any]]:
-        """获取所有供应商的模型列表
-        
-        Args:
-            force_refresh: 是否强制刷新缓存，默认False
-            
+        """获取所有供应商的模型列表（带TTL缓存）
+
+        并发调用会合并为一次上游扇出：持有锁的调用负责刷新，
+        其余调用等锁释放后直接读缓存。
+
         Returns:
             模型列表
         """
+        if self._models_cache is not None and time.monotonic() < self._models_deadline:
+            return self._models_cache
+
+        async with self._models_lock:
+            # 双重检查：等锁期间可能已有调用完成了刷新
+            if self._models_cache is not None and time.monotonic() < self._models_deadline:
+                return self._models_cache
+
+            all_models = await self._fetch_all_models()
+            self._models_cache = all_models
+            self._models_deadline = time.monotonic() + self._models_ttl
+            return all_models
+
+    async def _fetch_all_models(self) -> List[Dict[str, Any]]:
+        """并发从所有供应商拉取模型列表"""
         logger.info("开始获取所有供应商的模型列表")
-        all_models = []
-        tasks = []
-        
+
         # 并发调用所有供应商的get_models
-        # 每个ProviderClient会自己管理缓存和重试
-        for client in self.clients.values():
-            tasks.append(client.get_models())
-        
-        # 并发获取所有供应商的模型
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        success_count = 0
-        for i, result in enumerate(results):
-            provider_name = list(self.clients.keys())[i]
-            if isinstance(result, list):
-                if result:
-                    all_models.extend(result)
-                    success_count += 1
-                    logger.debug(f"供应商 {provider_name} 返回 {len(result)} 个模型")
-                else:
-                    logger.debug(f"供应商 {provider_name} 返回空模型列表")
-            else:
-                logger.warning(f"供应商 {provider_name} 获取模型异常: {result}")
+        # helper内部捕获异常并始终返回(名称, 结果)，失败以None表示，
+        # 不再需要return_exceptions和逐结果的isinstance分派
+        async def fetch_one(name: str, client: ProviderClient) -> tuple:
+            try:
+                return name, await client.get_models()
+            except Exception as e:
+                logger.warning("供应商 %s 获取模型异常: %s", name, e)
+                return name, None
+
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(fetch_one(name, client))
+                     for name, client in self.clients.items()]
+
+        results = [task.result() for task in tasks]
+
+        # 一次链式物化所有模型：chain.from_iterable在C层迭代，
+        # 避免循环内反复extend触发的列表扩容
+        all_models = list(itertools.chain.from_iterable(
+            models for _, models in results if models))
+        success_count = sum(1 for _, models in results if models)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            for provider_name, models in results:
+                if models:
+                    logger.debug("供应商 %s 返回 %s 个模型", provider_name, len(models))
+                elif models is not None:
+                    logger.debug("供应商 %s 返回空模型列表", provider_name)
         
         # 如果有config，则过滤模型列表
         if self.config:
             all_models = self.config.filter_models(all_models)
-        
-        logger.info(f"获取到 {len(all_models)} 个模型 (成功供应商: {success_count}/{len(self.clients)})")
-        
+
+        # 重建模型ID -> 客户端路由表，聊天请求可以单次哈希查找直达供应商
+        self._model_to_client = {
+            m["id"]: self.clients[m["owned_by"]]
+            for m in all_models if m.get("owned_by") in self.clients
+        }
+
+        logger.info("获取到 %s 个模型 (成功供应商: %s/%s)", len(all_models), success_count, len(self.clients))
+
         return all_models
     
     def get_provider_client(self, model: str) -> Optional[ProviderClient]:
         """根据模型名称获取对应的供应商客户端"""
+        # 快路径：路由表直接命中，无需解析前缀
+        client = self._model_to_client.get(model)
+        if client is not None:
+            return client
+
+        # 回退：按前缀解析（路由表尚未收录的新模型仍可正常路由）
         provider_name, _ = ProviderClient.parse_model_name(model)
         
         if not provider_name:
-            logger.warning(f"模型名称格式错误，缺少供应商前缀: {model}")
+            logger.warning("模型名称格式错误，缺少供应商前缀: %s", model)
             return None
         
         client = self.clients.get(provider_name)
         if client:
-            logger.debug(f"找到模型 {model} 对应的供应商: {provider_name}")
+            # 缓存解析结果，同一模型的后续请求走快路径
+            self._model_to_client[model] = client
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("找到模型 %s 对应的供应商: %s", model, provider_name)
         else:
-            logger.warning(f"未找到模型 {model} 对应的供应商: {provider_name}")
+            logger.warning("未找到模型 %s 对应的供应商: %s", model, provider_name)
         return client
     
     async def chat_completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
@@ -417,11 +539,11 @@ class ModelManager:
                 }
             }
         
-        logger.info(f"处理聊天完成请求，模型: {model}, 消息数: {len(messages)}")
+        logger.info("处理聊天完成请求，模型: %s, 消息数: %s", model, len(messages))
         
         client = self.get_provider_client(model)
         if not client:
-            logger.error(f"未找到模型 {model} 对应的供应商")
+            logger.error("未找到模型 %s 对应的供应商", model)
             return {
                 "error": {
                     "message": f"未找到模型 {model} 对应的供应商",
@@ -434,37 +556,41 @@ class ModelManager:
         result = await client.chat_completion(body)
         
         if "error" in result:
-            logger.error(f"聊天完成请求失败: {result['error']['message']}")
+            logger.error("聊天完成请求失败: %s", result['error']['message'])
         else:
-            logger.info(f"聊天完成请求成功")
+            logger.info("聊天完成请求成功")
             
         return result
     
     async def health_check(self) -> Dict[str, bool]:
         """检查所有供应商的健康状态"""
         logger.info("开始健康检查")
-        health_status = {}
-        
-        # 使用asyncio.gather并发执行健康检查
-        tasks = [client.health_check() for client in self.clients.values()]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        for i, (name, result) in enumerate(zip(self.clients.keys(), results)):
-            if isinstance(result, bool):
-                health_status[name] = result
-            elif isinstance(result, Exception):
-                logger.error(f"供应商 {name} 健康检查异常: {result}")
-                health_status[name] = False
-            else:
-                health_status[name] = False
+
+        # TaskGroup并发执行健康检查，总耗时取决于最慢的供应商而不是所有供应商之和；
+        # 单个供应商挂起时由wait_for兜底，异常在helper内部处理为False
+        async def probe_one(name: str, client: ProviderClient) -> tuple:
+            try:
+                return name, await asyncio.wait_for(client.health_check(), timeout=3.0)
+            except Exception as e:
+                logger.error("供应商 %s 健康检查异常: %s", name, e)
+                return name, False
+
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(probe_one(name, client))
+                     for name, client in self.clients.items()]
+
+        health_status = dict(task.result() for task in tasks)
         
         healthy_count = sum(1 for status in health_status.values() if status)
-        logger.info(f"健康检查完成，健康供应商: {healthy_count}/{len(health_status)}")
+        logger.info("健康检查完成，健康供应商: %s/%s", healthy_count, len(health_status))
         return health_status
     
     def clear_cache(self):
         """清除所有供应商的模型缓存"""
         logger.info("清除所有供应商的模型缓存")
+        self._models_cache = None
+        self._models_deadline = 0.0
+        self._model_to_client = {}
         for client in self.clients.values():
             client._models_cache = None
     
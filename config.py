@@ -1,8 +1,12 @@
 """配置管理模块"""
+import atexit
 import os
-import json
+import orjson
+import queue
 import re
 import logging
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 from typing import List, Tuple, Dict, Optional
 from dataclasses import dataclass
 
@@ -16,44 +20,85 @@ LOG_LEVEL_MAP = {
     'CRITICAL': logging.CRITICAL
 }
 
+# 后台日志监听器（进程内单例）：真正的文件/终端写入在它的线程里完成
+_log_listener: Optional[QueueListener] = None
+
 def setup_logging(log_level: str = 'WARNING'):
     """配置日志系统
-    
+
+    日志走QueueHandler异步化：事件循环里的logger调用只往内存队列放一条
+    记录，文件和终端的阻塞写入由后台线程的QueueListener完成，
+    不会卡住异步请求处理。
+
     Args:
         log_level: 日志级别，可选值: DEBUG, INFO, WARNING, ERROR, CRITICAL
                   默认为 WARNING
     """
+    global _log_listener
     level = LOG_LEVEL_MAP.get(log_level.upper(), logging.WARNING)
-    
-    # 清除现有的handlers
+
     root_logger = logging.getLogger()
+
+    # 日志管线已就绪时（典型场景：加载配置后调整日志级别），
+    # 只需改根logger级别，不拆除重建handler和监听器线程
+    if _log_listener is not None and root_logger.handlers:
+        root_logger.setLevel(level)
+        return logging.getLogger(__name__)
+
+    # 清除现有的handlers
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
-    
-    # 重新配置日志
+
+    # 监听器只创建一次，重新配置（如日志级别变化）时复用已有队列和线程
+    if _log_listener is None:
+        _log_listener = QueueListener(
+            queue.Queue(-1),
+            logging.FileHandler('ai_proxy.log', encoding='utf-8'),
+            logging.StreamHandler()
+        )
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+
+    # 重新配置日志：挂到根logger上的只有入队handler，
+    # 格式化在入队时完成（QueueHandler.prepare），落盘由监听器线程处理
     logging.basicConfig(
         level=level,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('ai_proxy.log', encoding='utf-8'),
-            logging.StreamHandler()
-        ],
+        handlers=[QueueHandler(_log_listener.queue)],
         force=True  # 强制重新配置
     )
-    
+
     return logging.getLogger(__name__)
 
 # 初始化logger（使用默认级别）
 logger = setup_logging()
 
+# 正则元字符集合：不含这些字符的supported_models条目是纯字面量，
+# 可以走集合精确匹配的快路径（'-'在字符类外是普通字符，不计入）
+_REGEX_METACHARS = frozenset('\\^$.|?*+()[]{}')
 
-@dataclass
+# 竖线分隔符（连同两侧空白一并吞掉）：切分后无需再逐字段strip
+_PIPE_SPLIT = re.compile(r'\s*\|\s*')
+
+
+@lru_cache(maxsize=1024)
+def _compile_pattern(pattern: str) -> re.Pattern:
+    """编译模型匹配模式（进程级缓存：模式未变化的reload直接命中）"""
+    return re.compile(pattern, re.IGNORECASE)
+
+
+@dataclass(slots=True, frozen=True)
 class Provider:
-    """供应商配置"""
+    """供应商配置
+
+    slots省掉每实例的__dict__（属性读取走C层槽描述符，请求路径上
+    频繁访问url/api_key）；frozen保证配置对象加载后不可变，
+    所有规范化（strip、去尾斜杠）都在from_dict/from_line中完成。
+    """
     name: str
     url: str
     api_key: str
-    model_list: List[str]
+    model_list: frozenset  # 手动配置的模型集合，成员检查O(1)
     
     @classmethod
     def from_dict(cls, data: dict) -> 'Provider':
@@ -75,7 +120,7 @@ class Provider:
             name=data['provider'].strip(),
             url=data['baseurl'].rstrip('/'),
             api_key=data['token'].strip(),
-            model_list=data.get('model_list', [])
+            model_list=frozenset(data.get('model_list') or ())
         )
     
     @classmethod
@@ -92,30 +137,45 @@ class Provider:
         if not line or line.startswith('#'):
             return None
             
-        parts = line.split('|')
+        # 一次正则切分吞掉分隔符两侧空白，省去逐字段strip的临时字符串；
+        # 限定分割次数：api_key本身含'|'时不会被切碎，也不分配多余片段
+        parts = _PIPE_SPLIT.split(line, maxsplit=2)
         if len(parts) != 3:
             raise ValueError(f"配置格式错误: {line}，正确格式：供应商名称|URL|API_KEY")
-        
+
         name, url, api_key = parts
-        
+
         return cls(
-            name=name.strip(),
+            name=name,
             url=url.rstrip('/'),
-            api_key=api_key.strip(),
-            model_list=[]
+            api_key=api_key,
+            model_list=frozenset()
         )
 
 
+# 供应商配置条目类型 -> 解析函数 分发表：
+# type()加一次字典查找代替逐条目的isinstance链
+_PROVIDER_HANDLERS = {dict: Provider.from_dict, str: Provider.from_line}
+
+
 class Config:
     """配置管理器"""
     
     def __init__(self, config_file: str = "config.json"):
         self.config_file = config_file
         self.providers: List[Provider] = []
+        self._providers_by_name: Dict[str, Provider] = {}  # 供应商名称索引，O(1)查找
+        self._cfg_cache_key: Optional[Tuple[int, int]] = None  # 配置文件指纹 (mtime_ns, size)
         self.valid_tokens: Dict[str, str] = {}
+        self._token_set: frozenset = frozenset()  # token白名单索引，O(1)验证
+        self._token_info: Dict[str, str] = {}  # token -> 描述 反向索引
         self.supported_models: List[str] = []
+        self._compiled_patterns: List[re.Pattern] = []  # 预编译的模型匹配模式
+        self._combined_pattern: Optional[re.Pattern] = None  # 所有有效模式的合并正则
+        self._literal_models: frozenset = frozenset()  # 纯字面量模式（小写），精确命中走O(1)查找
         self.host: str = "localhost"
         self.port: int = 8080
+        self.workers: int = 0  # uvicorn工作进程数，0表示自动（2*CPU核心数+1）
         self.log_level: str = "WARNING"  # 默认日志级别
         
         # 连接池配置
@@ -129,22 +189,70 @@ class Config:
         
         # 响应大小限制
         self.max_response_size: int = 10 * 1024 * 1024  # 10MB
+
+        # 请求体大小限制
+        self.max_request_size: int = 10 * 1024 * 1024  # 10MB
+
+        # 聚合模型列表缓存TTL（秒）
+        self.models_cache_ttl: float = 60.0
         
-        logger.info(f"初始化配置管理器，配置文件: {config_file}")
-        self.load_config()
-    
-    def load_config(self):
-        """从JSON文件加载配置"""
+        # 先解析一次配置文件确定日志级别：日志管线直接以用户配置的级别
+        # 建好，首批加载日志不会先按默认WARNING被过滤再触发一次重配置
+        config_data = self._parse_config_file()
+        if config_data is not None:
+            self.log_level = str(config_data.get('log_level', 'WARNING')).upper()
+            setup_logging(self.log_level)
+
+        logger.info("初始化配置管理器，配置文件: %s", config_file)
+        self.load_config(config_data)
+
+    def _parse_config_file(self) -> Optional[dict]:
+        """读取并解析配置文件
+
+        Returns:
+            解析后的配置字典；文件不存在或解析失败返回None
+        """
         if not os.path.exists(self.config_file):
-            logger.warning(f"配置文件不存在: {self.config_file}")
+            logger.warning("配置文件不存在: %s", self.config_file)
+            return None
+        try:
+            # 二进制读取 + orjson解析：跳过文本模式的解码包装层和纯Python的tokenizer
+            with open(self.config_file, 'rb') as f:
+                return orjson.loads(f.read())
+        except orjson.JSONDecodeError as e:
+            logger.error("JSON解析错误: %s", e)
+            return None
+        except OSError as e:
+            logger.error("读取配置文件失败: %s", e)
+            return None
+
+    def load_config(self, config_data: Optional[dict] = None):
+        """从JSON文件加载配置
+
+        Args:
+            config_data: 已解析的配置字典（__init__预读日志级别后传入，
+                         同一文件不解析两次）；为None时重新读取文件
+        """
+        # 文件指纹未变化时直接短路：无变更的reload()不再做
+        # 磁盘读取、JSON解析和providers/tokens/正则的全量重建
+        try:
+            st = os.stat(self.config_file)
+            cache_key = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            cache_key = None
+        if cache_key is not None and cache_key == self._cfg_cache_key:
+            logger.info("配置文件未变化，跳过重新加载")
             return
-        
+
+        if config_data is None:
+            config_data = self._parse_config_file()
+        if config_data is None:
+            return
+
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
-            
             self.host = config_data.get('host', 'localhost')
             self.port = config_data.get('port', 8080)
+            self.workers = config_data.get('workers', 0)
             
             # 加载日志级别配置
             new_log_level = config_data.get('log_level', 'WARNING').upper()
@@ -152,7 +260,7 @@ class Config:
                 self.log_level = new_log_level
                 # 重新配置日志级别
                 setup_logging(self.log_level)
-                logging.getLogger(__name__).info(f"日志级别已设置为: {self.log_level}")
+                logging.getLogger(__name__).info("日志级别已设置为: %s", self.log_level)
             
             # 加载连接池配置
             self.max_connections = config_data.get('max_connections', 100)
@@ -165,38 +273,43 @@ class Config:
             
             # 加载响应大小限制
             self.max_response_size = config_data.get('max_response_size', 10 * 1024 * 1024)
+
+            # 加载请求体大小限制
+            self.max_request_size = config_data.get('max_request_size', 10 * 1024 * 1024)
+
+            # 加载模型列表缓存TTL
+            self.models_cache_ttl = config_data.get('models_cache_ttl', 60.0)
             
-            logger.info(f"连接池配置 - 最大连接数: {self.max_connections}, "
-                       f"保持连接数: {self.max_keepalive_connections}, "
-                       f"过期时间: {self.keepalive_expiry}秒")
-            logger.info(f"超时配置 - 流式: {self.stream_timeout}秒, 非流式: {self.non_stream_timeout}秒")
-            logger.info(f"响应大小限制: {self.max_response_size / 1024 / 1024:.1f}MB")
+            logger.info("连接池配置 - 最大连接数: %s, 保持连接数: %s, 过期时间: %s秒",
+                        self.max_connections, self.max_keepalive_connections,
+                        self.keepalive_expiry)
+            logger.info("超时配置 - 流式: %s秒, 非流式: %s秒", self.stream_timeout, self.non_stream_timeout)
+            logger.info("响应大小限制: %.1fMB", self.max_response_size / 1024 / 1024)
 
             # 加载供应商配置
             self.providers = []
+            self._providers_by_name = {}
             providers_data = config_data.get('providers', [])
             
             for item in providers_data:
+                # 新格式dict / 旧格式字符串"name|url|key"，按类型分发
+                handler = _PROVIDER_HANDLERS.get(type(item))
+                if handler is None:
+                    logger.warning("未知的供应商配置格式: %s", item)
+                    continue
                 try:
-                    if isinstance(item, dict):
-                        # 新格式：字典对象
-                        provider = Provider.from_dict(item)
-                    elif isinstance(item, str):
-                        # 旧格式：字符串 "name|url|key"
-                        provider = Provider.from_line(item)
-                    else:
-                        logger.warning(f"未知的供应商配置格式: {item}")
-                        continue
-                    
-                    if provider:
-                        self.providers.append(provider)
-                        model_count = len(provider.model_list) if provider.model_list else "自动获取"
-                        logger.debug(f"加载供应商: {provider.name}, 模型列表: {model_count}")
+                    provider = handler(item)
                 except Exception as e:
-                    logger.error(f"加载供应商配置失败: {item}, 错误: {e}")
+                    logger.error("加载供应商配置失败: %s, 错误: %s", item, e)
                     continue
+
+                if provider:
+                    self.providers.append(provider)
+                    self._providers_by_name[provider.name] = provider
+                    model_count = len(provider.model_list) if provider.model_list else "自动获取"
+                    logger.debug("加载供应商: %s, 模型列表: %s", provider.name, model_count)
             
-            logger.info(f"成功加载 {len(self.providers)} 个供应商配置")
+            logger.info("成功加载 %s 个供应商配置", len(self.providers))
             
             # 加载token配置
             self.valid_tokens = {}
@@ -204,81 +317,112 @@ class Config:
             for line in tokens_data:
                 line = line.strip()
                 if line and not line.startswith('#'):
-                    parts = line.split('|')
-                    if len(parts) == 2:
-                        description, token = parts
-                        self.valid_tokens[description.strip()] = token.strip()
-                        logger.debug(f"加载token: {description}")
+                    # partition一次扫描完成切分且不构造列表，token本身可以包含'|'
+                    description, sep, token = line.partition('|')
+                    if sep:
+                        self.valid_tokens[description.rstrip()] = token.lstrip()
+                        logger.debug("加载token: %s", description)
             
-            logger.info(f"成功加载 {len(self.valid_tokens)} 个token")
+            # 预构建token索引，验证走哈希查找而不是逐个遍历
+            self._token_info = {tok: desc for desc, tok in self.valid_tokens.items()}
+            self._token_set = frozenset(self._token_info)
+
+            logger.info("成功加载 %s 个token", len(self.valid_tokens))
             
             # 加载支持的模型列表
             self.supported_models = config_data.get('supported_models', [])
-            logger.info(f"成功加载 {len(self.supported_models)} 个支持的模型模式")
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON解析错误: {e}")
+
+            # 预编译匹配模式：逐个校验（无效模式记录并跳过），
+            # 再合并为一个交替正则，过滤时每个模型只做一次C级匹配
+            self._compiled_patterns = []
+            valid_patterns = []
+            literal_models = set()
+            for pattern in self.supported_models:
+                try:
+                    self._compiled_patterns.append(_compile_pattern(pattern))
+                    valid_patterns.append(pattern)
+                    # 纯字面量模式（如精确的模型ID）同时收进集合，
+                    # 精确命中时绕过正则引擎；子串匹配仍由合并正则兜底
+                    if _REGEX_METACHARS.isdisjoint(pattern):
+                        literal_models.add(pattern.lower())
+                except re.error as e:
+                    logger.warning("正则表达式模式错误 '%s': %s", pattern, e)
+            self._literal_models = frozenset(literal_models)
+            if valid_patterns:
+                self._combined_pattern = _compile_pattern(
+                    "|".join(f"(?:{p})" for p in valid_patterns))
+            else:
+                self._combined_pattern = None
+
+            logger.info("成功加载 %s 个支持的模型模式", len(self.supported_models))
+
+            # 全部加载成功后才记录指纹；失败时保持为None，下次reload重新解析
+            self._cfg_cache_key = cache_key
+
         except Exception as e:
-            logger.error(f"加载配置文件失败: {e}")
+            logger.error("加载配置文件失败: %s", e)
 
     def get_provider_by_name(self, name: str) -> Provider | None:
-        """根据名称获取供应商"""
-        provider = next((p for p in self.providers if p.name == name), None)
+        """根据名称获取供应商（名称索引，单次哈希查找）"""
+        provider = self._providers_by_name.get(name)
         if provider:
-            logger.debug(f"找到供应商: {name}")
+            logger.debug("找到供应商: %s", name)
         else:
-            logger.warning(f"未找到供应商: {name}")
+            logger.warning("未找到供应商: %s", name)
         return provider
     
     
     def validate_token(self, token: str) -> bool:
         """验证token是否在白名单中"""
-        is_valid = token in self.valid_tokens.values()
+        is_valid = token in self._token_set
         if is_valid:
             token_info = self.get_token_info(token)
-            logger.info(f"token验证成功: {token_info}")
+            logger.info("token验证成功: %s", token_info)
         else:
-            logger.warning(f"token验证失败: {token}")
+            # 只记录前缀：避免把完整token明文写进日志
+            logger.warning("token验证失败: %s...", token[:8])
         return is_valid
-    
+
     def get_token_info(self, token: str) -> str | None:
         """获取token描述信息"""
-        for description, valid_token in self.valid_tokens.items():
-            if token == valid_token:
-                return description
-        return None
+        return self._token_info.get(token)
     
     def is_model_supported(self, model_id: str) -> bool:
-        """检查模型是否在支持列表中（使用正则表达式匹配，不区分大小写）"""
+        """检查模型是否在支持列表中（预编译的合并正则，不区分大小写）"""
         if not self.supported_models:
             # 如果没有配置支持的模型列表，则允许所有模型
             return True
-        
-        # 使用正则表达式匹配，不区分大小写
-        for pattern in self.supported_models:
-            try:
-                if re.search(pattern, model_id, re.IGNORECASE):
-                    logger.debug(f"模型 {model_id} 匹配模式 {pattern}")
-                    return True
-            except re.error as e:
-                logger.warning(f"正则表达式模式错误 '{pattern}': {e}")
-                continue
-        
-        logger.debug(f"模型 {model_id} 不匹配任何支持的模式")
+
+        # 快路径：字面量模式的精确命中，一次哈希查找解决
+        if model_id.lower() in self._literal_models:
+            logger.debug("模型 %s 精确匹配支持列表", model_id)
+            return True
+
+        # 所有模式都无效时合并正则为None，保持原有行为：不匹配任何模型
+        if self._combined_pattern is not None and self._combined_pattern.search(model_id):
+            logger.debug("模型 %s 匹配支持的模式", model_id)
+            return True
+
+        logger.debug("模型 %s 不匹配任何支持的模式", model_id)
         return False
     
     def filter_models(self, models: List[Dict]) -> List[Dict]:
-        """过滤模型列表，只保留支持的模型"""
+        """过滤模型列表，只保留支持的模型（单次推导式内联匹配）"""
         if not self.supported_models:
             # 如果没有配置支持的模型列表，则返回所有模型
             return models
-        
+
+        # 内联is_model_supported的匹配逻辑：字面量精确命中优先，
+        # 其余走合并正则，每个模型最多一次正则调用，省去逐模型的函数进出
+        literals = self._literal_models
+        combined = self._combined_pattern
         filtered_models = [
             model for model in models
-            if self.is_model_supported(model.get('id', ''))
+            if (model_id := model.get('id', '')).lower() in literals
+            or (combined is not None and combined.search(model_id))
         ]
         
-        logger.info(f"模型过滤: {len(models)} -> {len(filtered_models)}")
+        logger.info("模型过滤: %s -> %s", len(models), len(filtered_models))
         return filtered_models
     
     def reload(self):